@@ -1,11 +1,17 @@
-import pygame
+import time
+
+START_TIME = time.perf_counter()
+
 import sys
 import random
 import math
+import json
+import os
+import queue
+import threading
+import pygame
 
-# Initialize Pygame
-pygame.init()
-pygame.mixer.init()
+PYGAME_IMPORTED = time.perf_counter()
 
 # Constants
 SCREEN_WIDTH = 800
@@ -27,52 +33,428 @@ ORANGE = (255, 165, 0)
 BLUE = (0, 0, 255)
 GRAY = (128, 128, 128)
 
-# Create the screen
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("Super Mario Bros. - PC Edition")
-clock = pygame.time.Clock()
-
-# Load fonts
-try:
-    font_large = pygame.font.Font(None, 48)
-    font_medium = pygame.font.Font(None, 36)
-    font_small = pygame.font.Font(None, 24)
-except:
-    font_large = pygame.font.SysFont('arial', 48)
-    font_medium = pygame.font.SysFont('arial', 36)
-    font_small = pygame.font.SysFont('arial', 24)
+# Startup timing (milliseconds per stage)
+startup_times = {"import": (PYGAME_IMPORTED - START_TIME) * 1000}
+
+def record_stage(name, start):
+    startup_times[name] = (time.perf_counter() - start) * 1000
+
+def report_startup():
+    stages = " | ".join(f"{name}: {ms:.1f} ms" for name, ms in startup_times.items())
+    print(f"Startup: {stages}")
+
+# The window is created in init_display() so importing stays cheap
+screen = None
+clock = None
+
+def init_display():
+    global screen, clock
+    start = time.perf_counter()
+    pygame.display.init()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption("Super Mario Bros. - PC Edition")
+    clock = pygame.time.Clock()
+    record_stage("display", start)
+
+# Fonts are loaded the first time they are rendered
+class LazyFont:
+    def __init__(self, size):
+        self.size = size
+        self.font = None
+    
+    def render(self, text, antialias, color):
+        if self.font is None:
+            start = time.perf_counter()
+            if not pygame.font.get_init():
+                pygame.font.init()
+            try:
+                self.font = pygame.font.Font(None, self.size)
+            except:
+                self.font = pygame.font.SysFont('arial', self.size)
+            record_stage(f"font {self.size}", start)
+        return self.font.render(text, antialias, color)
+
+font_large = LazyFont(48)
+font_medium = LazyFont(36)
+font_small = LazyFont(24)
 
 # Create simple sound effects using pygame.mixer.Sound (placeholder)
-def create_beep_sound(frequency=440, duration=100):
+def create_beep_samples(frequency=440, duration=100):
+    # Pure numpy, so it is safe to run on the background loader
     sample_rate = 44100
     n_samples = int(round(duration * 0.001 * sample_rate))
-    buf = numpy.zeros((n_samples, 2), dtype=numpy.int16)
     max_sample = 2**(16 - 1) - 1
-    for s in range(n_samples):
-        t = float(s) / sample_rate
-        buf[s][0] = int(round(max_sample * math.sin(2 * math.pi * frequency * t)))
-        buf[s][1] = int(round(max_sample * math.sin(2 * math.pi * frequency * t)))
-    return pygame.sndarray.make_sound(buf)
-
-# Try to create sounds, fallback to silent sounds if numpy not available
-try:
-    import importlib
-    import importlib.util
-    # Only import numpy if present on the system to avoid unresolved-import warnings
-    if importlib.util.find_spec("numpy") is not None:
+    t = numpy.arange(n_samples) / sample_rate
+    wave = numpy.round(max_sample * numpy.sin(2 * math.pi * frequency * t)).astype(numpy.int16)
+    return numpy.column_stack((wave, wave))
+
+# Sounds stay silent until build_sounds() replaces them
+class SilentSound:
+    def play(self):
+        pass
+
+numpy = None
+mixer_ready = False
+beep_samples = {}
+jump_sound = SilentSound()
+coin_sound = SilentSound()
+enemy_sound = SilentSound()
+game_over_sound = SilentSound()
+
+def load_assets():
+    # Runs on a background thread while the menu is already on screen. It
+    # never touches SDL: the mixer and Sound objects are created on the
+    # main thread by init_audio() and build_sounds().
+    global numpy
+    start = time.perf_counter()
+    try:
+        import importlib
+        import importlib.util
+        # Only import numpy if present on the system to avoid unresolved-import warnings
+        if importlib.util.find_spec("numpy") is None:
+            return
         numpy = importlib.import_module("numpy")
-        jump_sound = create_beep_sound(523, 100)  # C note
-        coin_sound = create_beep_sound(659, 150)  # E note
-        enemy_sound = create_beep_sound(220, 200)  # A note
-        game_over_sound = create_beep_sound(110, 500)  # Low A note
-    else:
-        raise ImportError("numpy not available")
-except Exception:
-    # Create silent sounds as fallback
-    jump_sound = pygame.mixer.Sound(bytes(0))
-    coin_sound = pygame.mixer.Sound(bytes(0))
-    enemy_sound = pygame.mixer.Sound(bytes(0))
-    game_over_sound = pygame.mixer.Sound(bytes(0))
+    except Exception:
+        return
+    record_stage("numpy", start)
+    
+    start = time.perf_counter()
+    try:
+        particles.allocate()
+        record_stage("particles", start)
+    except Exception:
+        pass
+    
+    start = time.perf_counter()
+    try:
+        beep_samples["jump"] = create_beep_samples(523, 100)  # C note
+        beep_samples["coin"] = create_beep_samples(659, 150)  # E note
+        beep_samples["enemy"] = create_beep_samples(220, 200)  # A note
+        beep_samples["game_over"] = create_beep_samples(110, 500)  # Low A note
+        record_stage("sound samples", start)
+    except Exception:
+        beep_samples.clear()
+
+def init_audio():
+    # Called on the main thread once the first frame is on screen
+    global mixer_ready
+    start = time.perf_counter()
+    try:
+        pygame.mixer.init()
+    except Exception:
+        # No audio device: the game stays silent
+        return
+    mixer_ready = True
+    record_stage("mixer", start)
+
+def build_sounds():
+    # Called on the main thread after the loader has finished
+    global jump_sound, coin_sound, enemy_sound, game_over_sound
+    if not mixer_ready or len(beep_samples) < 4:
+        return
+    start = time.perf_counter()
+    try:
+        jump_sound = pygame.sndarray.make_sound(beep_samples["jump"])
+        coin_sound = pygame.sndarray.make_sound(beep_samples["coin"])
+        enemy_sound = pygame.sndarray.make_sound(beep_samples["enemy"])
+        game_over_sound = pygame.sndarray.make_sound(beep_samples["game_over"])
+    except Exception:
+        # Keep the silent sounds as fallback
+        return
+    record_stage("sounds", start)
+
+# Particle effects
+PARTICLE_CAPACITY = 32768
+PARTICLE_SIZE = 3
+
+class ParticleSystem:
+    # All particles live in preallocated arrays; new bursts overwrite the
+    # oldest slots (ring buffer), so nothing is allocated per particle.
+    def __init__(self, capacity=PARTICLE_CAPACITY):
+        self.capacity = capacity
+        self.head = 0
+        self.palette = []
+        self.enabled = False
+    
+    def allocate(self):
+        # Called once numpy has been imported; until then effects are skipped
+        capacity = self.capacity
+        self.rng = numpy.random.default_rng()
+        self.x = numpy.zeros(capacity, dtype=numpy.float32)
+        self.y = numpy.zeros(capacity, dtype=numpy.float32)
+        self.vel_x = numpy.zeros(capacity, dtype=numpy.float32)
+        self.vel_y = numpy.zeros(capacity, dtype=numpy.float32)
+        self.gravity = numpy.zeros(capacity, dtype=numpy.float32)
+        self.life = numpy.zeros(capacity, dtype=numpy.int16)
+        self.color = numpy.zeros(capacity, dtype=numpy.uint8)
+        self.alive = numpy.zeros(capacity, dtype=bool)
+        self.in_view = numpy.zeros(capacity, dtype=bool)
+        self.scratch = numpy.zeros(capacity, dtype=numpy.float32)
+        self.pixel_x = numpy.zeros(capacity, dtype=numpy.intp)
+        self.pixel_y = numpy.zeros(capacity, dtype=numpy.intp)
+        # RGB lookup table indexed by the per-particle colour index
+        self.palette_rgb = numpy.zeros((256, 3), dtype=numpy.uint8)
+        self.enabled = True
+    
+    def color_index(self, color):
+        color = tuple(color[:3])
+        if color not in self.palette:
+            if len(self.palette) == len(self.palette_rgb):
+                return 0
+            self.palette_rgb[len(self.palette)] = color
+            self.palette.append(color)
+        return self.palette.index(color)
+    
+    def emit(self, x, y, count, color, speed=3.0, life=40, gravity=1.0,
+             angle_min=0.0, angle_max=2 * math.pi):
+        if not self.enabled or count <= 0:
+            return
+        count = min(count, self.capacity)
+        slots = (self.head + numpy.arange(count)) % self.capacity
+        self.head = (self.head + count) % self.capacity
+        
+        angles = self.rng.uniform(angle_min, angle_max, count)
+        speeds = self.rng.uniform(0.3, 1.0, count) * speed
+        self.x[slots] = x
+        self.y[slots] = y
+        self.vel_x[slots] = numpy.cos(angles) * speeds
+        self.vel_y[slots] = numpy.sin(angles) * speeds
+        self.gravity[slots] = gravity
+        self.life[slots] = self.rng.integers(life // 2, life + 1, count)
+        self.color[slots] = self.color_index(color)
+    
+    def update(self):
+        if not self.enabled:
+            return
+        # Integrate every slot in one batch; dead slots are simply ignored
+        numpy.multiply(self.gravity, GRAVITY, out=self.scratch)
+        self.vel_y += self.scratch
+        self.x += self.vel_x
+        self.y += self.vel_y
+        self.life -= 1
+        numpy.maximum(self.life, 0, out=self.life)
+    
+    def draw(self):
+        if not self.enabled:
+            return
+        # Visibility mask built in preallocated buffers: live and fully on screen
+        numpy.greater(self.life, 0, out=self.alive)
+        numpy.greater_equal(self.x, 0, out=self.in_view)
+        self.alive &= self.in_view
+        numpy.less(self.x, SCREEN_WIDTH - PARTICLE_SIZE, out=self.in_view)
+        self.alive &= self.in_view
+        numpy.greater_equal(self.y, 0, out=self.in_view)
+        self.alive &= self.in_view
+        numpy.less(self.y, SCREEN_HEIGHT - PARTICLE_SIZE, out=self.in_view)
+        self.alive &= self.in_view
+        visible = numpy.flatnonzero(self.alive)
+        if visible.size == 0:
+            return
+        
+        # Write the square for every visible particle straight into the
+        # screen pixels, one vectorized assignment per pixel of the square
+        numpy.copyto(self.pixel_x, self.x, casting="unsafe")
+        numpy.copyto(self.pixel_y, self.y, casting="unsafe")
+        xs = self.pixel_x[visible]
+        ys = self.pixel_y[visible]
+        rgb = self.palette_rgb[self.color[visible]]
+        pixels = pygame.surfarray.pixels3d(screen)
+        for dx in range(PARTICLE_SIZE):
+            for dy in range(PARTICLE_SIZE):
+                pixels[xs + dx, ys + dy] = rgb
+        # Release the surface lock before anything else draws
+        del pixels
+    
+    def clear(self):
+        if self.enabled:
+            self.life[:] = 0
+        self.head = 0
+    
+    # Preset effects
+    def coin_sparkle(self, x, y):
+        self.emit(x, y, 24, YELLOW, speed=3, life=25, gravity=0.1)
+        self.emit(x, y, 12, WHITE, speed=2, life=20, gravity=0.05)
+    
+    def stomp_debris(self, x, y):
+        self.emit(x, y, 40, (120, 70, 0), speed=5, life=35, gravity=0.6,
+                  angle_min=math.pi, angle_max=2 * math.pi)
+    
+    def brick_dust(self, x, y):
+        self.emit(x, y, 30, BROWN, speed=2.5, life=30, gravity=0.4,
+                  angle_min=0, angle_max=math.pi)
+    
+    def fireworks(self, x, y):
+        color = random.choice([RED, YELLOW, GREEN, ORANGE, WHITE, BLUE])
+        self.emit(x, y, 200, color, speed=7, life=60, gravity=0.08)
+    
+    def lose_life(self, x, y):
+        self.emit(x, y, 60, RED, speed=4, life=45, gravity=0.3)
+
+particles = ParticleSystem()
+
+# Gameplay telemetry
+TELEMETRY_DIR = "telemetry"
+TELEMETRY_BATCH_SIZE = 256
+FRAME_SAMPLE_INTERVAL = 30  # Sample one frame time every half second
+
+class Telemetry:
+    # Events are buffered as plain tuples on the frame loop and handed to a
+    # writer thread in batches; JSON encoding and file I/O happen there.
+    def __init__(self, directory=TELEMETRY_DIR, enabled=True):
+        self.enabled = enabled
+        self.level = 0
+        self.buffer = []
+        self.frame_count = 0
+        self.start_time = time.perf_counter()
+        self.path = os.path.join(directory, f"run-{int(time.time())}-{os.getpid()}.jsonl")
+        self.queue = queue.Queue()
+        self.writer = None
+        # Set by the writer thread when the file cannot be written
+        self.failed = False
+        if enabled:
+            self.writer = threading.Thread(target=self.write_batches, daemon=True)
+            self.writer.start()
+    
+    def record(self, event, **fields):
+        if not self.enabled or self.failed:
+            return
+        self.buffer.append((time.perf_counter() - self.start_time, event, self.level, fields))
+        if len(self.buffer) >= TELEMETRY_BATCH_SIZE:
+            self.flush()
+    
+    def sample_frame(self, frame_ms):
+        self.frame_count += 1
+        if self.frame_count % FRAME_SAMPLE_INTERVAL == 0:
+            self.record("frame", ms=frame_ms)
+    
+    def flush(self):
+        if self.buffer and not self.failed:
+            self.queue.put(self.buffer)
+        self.buffer = []
+    
+    def close(self):
+        if self.writer is None:
+            return
+        self.flush()
+        self.queue.put(None)
+        self.writer.join()
+        self.writer = None
+        self.enabled = False
+    
+    def write_batches(self):
+        # The file is only created once there is something to write, so
+        # launches that record no events leave nothing behind
+        output = None
+        while True:
+            batch = self.queue.get()
+            if batch is None:
+                break
+            if self.failed:
+                # Keep draining so queued batches are released
+                continue
+            
+            lines = []
+            for t, event, level, fields in batch:
+                entry = {"t": round(t, 3), "e": event, "lvl": level}
+                entry.update(fields)
+                lines.append(json.dumps(entry, separators=(",", ":")))
+            try:
+                if output is None:
+                    os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                    output = open(self.path, "a", encoding="utf-8")
+                output.write("\n".join(lines) + "\n")
+                output.flush()
+            except OSError:
+                # e.g. a full disk: drop this and every later batch
+                self.failed = True
+        
+        if output is not None:
+            try:
+                output.close()
+            except OSError:
+                pass
+
+def read_telemetry(paths):
+    # Stream events one line at a time so any number of runs can be read
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # A run killed mid-write can leave a partial last line
+                    continue
+
+def aggregate_telemetry(paths):
+    levels = {}
+    runs = 0
+    for path in paths:
+        events = 0
+        for entry in read_telemetry([path]):
+            events += 1
+            stats = levels.setdefault(entry.get("lvl", 0), {
+                "fall": 0, "hit": 0, "stomp": 0, "coin": 0, "level_complete": 0,
+                "time_total": 0.0, "time_min": None, "time_max": None,
+                "frame_ms": {},
+            })
+            event = entry.get("e")
+            if event in ("fall", "hit", "stomp", "coin"):
+                stats[event] += 1
+            elif event == "level_complete":
+                stats["level_complete"] += 1
+                seconds = entry.get("seconds", 0.0)
+                stats["time_total"] += seconds
+                if stats["time_min"] is None or seconds < stats["time_min"]:
+                    stats["time_min"] = seconds
+                if stats["time_max"] is None or seconds > stats["time_max"]:
+                    stats["time_max"] = seconds
+            elif event == "frame":
+                # Frame times are kept as a millisecond histogram
+                bucket = int(entry.get("ms", 0))
+                stats["frame_ms"][bucket] = stats["frame_ms"].get(bucket, 0) + 1
+        # Launches quit before any event are not counted as runs
+        if events:
+            runs += 1
+    return runs, levels
+
+def frame_percentile(histogram, fraction):
+    total = sum(histogram.values())
+    if total == 0:
+        return 0
+    seen = 0
+    for bucket in sorted(histogram):
+        seen += histogram[bucket]
+        if seen >= total * fraction:
+            return bucket
+    return bucket
+
+def print_telemetry_report(directory=TELEMETRY_DIR):
+    if not os.path.isdir(directory):
+        print("Runs: 0")
+        return
+    paths = sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                   if name.endswith(".jsonl"))
+    runs, levels = aggregate_telemetry(paths)
+    print(f"Runs: {runs}")
+    for level in sorted(levels):
+        if level == 0:
+            continue
+        stats = levels[level]
+        completions = stats["level_complete"]
+        average = stats["time_total"] / completions if completions else 0.0
+        print(f"Level {level}: completed {completions}, falls {stats['fall']}, "
+              f"hits {stats['hit']}, stomps {stats['stomp']}, coins {stats['coin']}")
+        if completions:
+            print(f"  time: avg {average:.1f}s, min {stats['time_min']:.1f}s, "
+                  f"max {stats['time_max']:.1f}s")
+        if stats["frame_ms"]:
+            print(f"  frame: p50 {frame_percentile(stats['frame_ms'], 0.5)} ms, "
+                  f"p95 {frame_percentile(stats['frame_ms'], 0.95)} ms")
+
+telemetry = Telemetry(enabled=False)
 
 class Player:
     def __init__(self, x, y):
@@ -103,7 +485,7 @@ class Player:
             self.jumping = True
             jump_sound.play()
     
-    def update(self, platforms, enemies, coins, flag):
+    def update(self, platforms, world):
         # Apply gravity
         self.vel_y += GRAVITY
         
@@ -133,6 +515,7 @@ class Player:
                 elif self.vel_y < 0:  # Jumping
                     self.y = platform.y + platform.height
                     self.vel_y = 0
+                    particles.brick_dust(self.x + self.width / 2, self.y)
         
         # Screen boundaries
         if self.x < 0:
@@ -142,6 +525,7 @@ class Player:
         
         # Check if fell off the screen
         if self.y > SCREEN_HEIGHT:
+            particles.lose_life(self.x + self.width / 2, SCREEN_HEIGHT)
             self.lives -= 1
             if self.lives > 0:
                 self.respawn()
@@ -149,15 +533,19 @@ class Player:
         
         # Check enemy collisions
         if self.invincible <= 0:
-            for enemy in enemies[:]:
-                if self.collision(enemy):
+            for enemy in world.entities("enemy")[:]:
+                if self.collision_entity(world, enemy):
                     # If jumping on enemy
-                    if self.vel_y > 0 and self.y < enemy.y:
-                        enemies.remove(enemy)
+                    if self.vel_y > 0 and self.y < world.y[enemy]:
+                        particles.stomp_debris(world.x[enemy] + world.width[enemy] / 2,
+                                               world.y[enemy] + world.height[enemy] / 2)
+                        world.despawn(enemy)
+                        telemetry.record("stomp")
                         self.vel_y = JUMP_STRENGTH * 0.7  # Bounce
                         self.score += 100
                         enemy_sound.play()
                     else:
+                        particles.lose_life(self.x + self.width / 2, self.y + self.height / 2)
                         self.lives -= 1
                         self.invincible = 90  # 1.5 seconds of invincibility
                         if self.lives > 0:
@@ -165,16 +553,20 @@ class Player:
                         return "hit"
         
         # Check coin collisions
-        for coin in coins[:]:
-            if self.collision(coin):
-                coins.remove(coin)
+        for coin in world.entities("coin")[:]:
+            if world.mask[coin] & COLLECTIBLE and self.collision_entity(world, coin):
+                particles.coin_sparkle(world.x[coin] + world.width[coin] / 2,
+                                       world.y[coin] + world.height[coin] / 2)
                 self.coins += 1
-                self.score += 200
+                self.score += world.value[coin]
+                world.despawn(coin)
+                telemetry.record("coin")
                 coin_sound.play()
         
         # Check flag collision
-        if flag and self.collision(flag):
-            return "level_complete"
+        for flag in world.entities("flag"):
+            if self.collision_entity(world, flag):
+                return "level_complete"
         
         # Decrease invincibility timer
         if self.invincible > 0:
@@ -188,6 +580,12 @@ class Player:
                 self.y < obj.y + obj.height and
                 self.y + self.height > obj.y)
     
+    def collision_entity(self, world, entity):
+        return (self.x < world.x[entity] + world.width[entity] and
+                self.x + self.width > world.x[entity] and
+                self.y < world.y[entity] + world.height[entity] and
+                self.y + self.height > world.y[entity])
+    
     def respawn(self):
         self.x = 100
         self.y = 300
@@ -271,150 +669,301 @@ class Platform:
                     pygame.draw.rect(screen, darker,
                                      (self.x + i, self.y + j, brick_width-1, brick_height-1), 1)
 
-class Enemy:
-    def __init__(self, x, y, move_range=100):
-        self.x = x
-        self.y = y
-        self.width = 30
-        self.height = 30
-        self.start_x = x
-        self.move_range = move_range
-        self.vel_x = -2
-        self.animation_frame = 0
+# Entity components (bit flags)
+POSITION = 1
+VELOCITY = 2
+AABB = 4
+ANIMATION = 8
+PATROL = 16
+COLLECTIBLE = 32
+
+# Draw function per entity kind, in draw order; prefabs register theirs below
+ENTITY_DRAW = {}
+
+class World:
+    # Entity-component storage. Position, velocity, size and collectible
+    # value are columns indexed by entity id; Animation and Patrol are packed
+    # densely (one slot per entity that has them) so each system walks only
+    # its own entities in a single zip over contiguous lists.
+    def __init__(self):
+        self.clear()
     
-    def update(self, platforms):
-        # Move enemy
-        self.x += self.vel_x
-        self.animation_frame = (self.animation_frame + 1) % 30
+    def clear(self):
+        self.mask = []
+        self.kind = []
+        self.x = []
+        self.y = []
+        self.vel_x = []
+        self.width = []
+        self.height = []
+        self.value = []
+        self.free = []
+        self.by_kind = {}
         
-        # Reverse direction at movement boundaries
-        if self.x < self.start_x - self.move_range or self.x > self.start_x + self.move_range:
-            self.vel_x *= -1
+        # Animation component (dense)
+        self.anim_slot = {}
+        self.anim_entity = []
+        self.anim_frame = []
+        self.anim_step = []
+        self.anim_period = []
         
-        # Check for platform edges
-        on_platform = False
-        for platform in platforms:
-            # Check if enemy is on this platform
-            if (self.y + self.height >= platform.y and 
-                self.y + self.height <= platform.y + 10 and
-                self.x + self.width > platform.x and 
-                self.x < platform.x + platform.width):
-                on_platform = True
-                break
-        
-        # If not on a platform, turn around
-        if not on_platform:
-            self.vel_x *= -1
+        # Patrol component (dense)
+        self.patrol_slot = {}
+        self.patrol_entity = []
+        self.patrol_min = []
+        self.patrol_max = []
+        self.patrol_feet = []
     
-    def draw(self):
-        # Draw Goomba with simple animation
-        body_color = (120, 70, 0)
-        underside_color = (100, 50, 0)
-        foot_color = (80, 40, 0)
-        
-        # Body
-        pygame.draw.ellipse(screen, body_color, (self.x, self.y, self.width, self.height))
-        
-        # Underside
-        pygame.draw.ellipse(screen, underside_color, (self.x + 5, self.y + 5, self.width - 10, self.height - 10))
-        
-        # Feet with simple animation
-        foot_offset = 0
-        if self.animation_frame < 15:
-            foot_offset = 2
-        
-        pygame.draw.ellipse(screen, foot_color, (self.x + 5, self.y + self.height - 5, 8, 5 + foot_offset))
-        pygame.draw.ellipse(screen, foot_color, (self.x + self.width - 13, self.y + self.height - 5, 8, 5 + foot_offset))
+    def spawn(self, kind, x, y, width, height, mask=POSITION | AABB):
+        if self.free:
+            entity = self.free.pop()
+        else:
+            entity = len(self.mask)
+            self.mask.append(0)
+            self.kind.append(None)
+            for column in (self.x, self.y, self.vel_x, self.width, self.height):
+                column.append(0.0)
+            self.value.append(0)
         
-        # Eyes
-        eye_offset = 0
-        if self.vel_x < 0:  # Looking left
-            eye_offset = -2
-        else:  # Looking right
-            eye_offset = 2
-            
-        pygame.draw.circle(screen, WHITE, (self.x + 10, self.y + 10), 4)
-        pygame.draw.circle(screen, WHITE, (self.x + self.width - 10, self.y + 10), 4)
-        pygame.draw.circle(screen, BLACK, (self.x + 10 + eye_offset, self.y + 10), 2)
-        pygame.draw.circle(screen, BLACK, (self.x + self.width - 10 + eye_offset, self.y + 10), 2)
-
-class Coin:
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
-        self.width = 20
-        self.height = 20
-        self.animation_frame = random.random() * 10
-        self.collected = False
+        self.mask[entity] = mask
+        self.kind[entity] = kind
+        self.x[entity] = x
+        self.y[entity] = y
+        self.vel_x[entity] = 0.0
+        self.width[entity] = width
+        self.height[entity] = height
+        self.by_kind.setdefault(kind, []).append(entity)
+        return entity
     
-    def update(self):
-        self.animation_frame += 0.2
+    def despawn(self, entity):
+        self.by_kind[self.kind[entity]].remove(entity)
+        if self.mask[entity] & ANIMATION:
+            self.remove_slot(entity, self.anim_slot, self.anim_entity,
+                             (self.anim_frame, self.anim_step, self.anim_period))
+        if self.mask[entity] & PATROL:
+            self.remove_slot(entity, self.patrol_slot, self.patrol_entity,
+                             (self.patrol_min, self.patrol_max, self.patrol_feet))
+        self.mask[entity] = 0
+        self.kind[entity] = None
+        self.free.append(entity)
     
-    def draw(self):
-        if not self.collected:
-            # Bobbing and spinning animation
-            bob_y = self.y + math.sin(self.animation_frame) * 5
-            rotation = self.animation_frame * 20
-            
-            # Draw coin with simple rotation effect
-            coin_radius = 8
-            center_x = self.x + self.width/2
-            center_y = bob_y + self.height/2
+    def remove_slot(self, entity, slots, entities, columns):
+        # Swap-remove keeps the component columns packed
+        slot = slots.pop(entity)
+        last = entities.pop()
+        for column in columns:
+            value = column.pop()
+            if last != entity:
+                column[slot] = value
+        if last != entity:
+            entities[slot] = last
+            slots[last] = slot
+    
+    def entities(self, kind):
+        return self.by_kind.get(kind, [])
+    
+    def animation_frame(self, entity):
+        return self.anim_frame[self.anim_slot[entity]]
+    
+    def set_animation(self, entity, frame=0.0, step=1.0, period=0.0):
+        if not self.mask[entity] & ANIMATION:
+            self.anim_slot[entity] = len(self.anim_entity)
+            self.anim_entity.append(entity)
+            self.anim_frame.append(0.0)
+            self.anim_step.append(0.0)
+            self.anim_period.append(0.0)
+        self.mask[entity] |= ANIMATION
+        slot = self.anim_slot[entity]
+        self.anim_frame[slot] = frame
+        self.anim_step[slot] = step
+        self.anim_period[slot] = period
+    
+    def set_patrol(self, entity, vel_x, move_range):
+        # Patrolling entities walk horizontally only, so the height of their
+        # feet is fixed when the component is added
+        if not self.mask[entity] & PATROL:
+            self.patrol_slot[entity] = len(self.patrol_entity)
+            self.patrol_entity.append(entity)
+            self.patrol_min.append(0.0)
+            self.patrol_max.append(0.0)
+            self.patrol_feet.append(0.0)
+        self.mask[entity] |= VELOCITY | PATROL
+        self.vel_x[entity] = vel_x
+        slot = self.patrol_slot[entity]
+        self.patrol_min[slot] = self.x[entity] - move_range
+        self.patrol_max[slot] = self.x[entity] + move_range
+        self.patrol_feet[slot] = self.y[entity] + self.height[entity]
+    
+    def set_collectible(self, entity, value):
+        self.mask[entity] |= COLLECTIBLE
+        self.value[entity] = value
+    
+    # Prefabs
+    def spawn_enemy(self, x, y, move_range=100):
+        entity = self.spawn("enemy", x, y, 30, 30)
+        self.set_patrol(entity, -2, move_range)
+        self.set_animation(entity, step=1, period=30)
+        return entity
+    
+    def spawn_coin(self, x, y):
+        entity = self.spawn("coin", x, y, 20, 20)
+        self.set_animation(entity, frame=random.random() * 10, step=0.2)
+        self.set_collectible(entity, 200)
+        return entity
+    
+    def spawn_flag(self, x, y):
+        entity = self.spawn("flag", x, y, 30, 60)
+        self.set_animation(entity, step=0.1)
+        return entity
+    
+    # Systems
+    def update(self, platforms):
+        self.patrol_system(platforms)
+        self.animation_system()
+    
+    def patrol_system(self, platforms):
+        x, vel_x, width = self.x, self.vel_x, self.width
+        # Platforms an entity can stand on depend only on its feet height
+        spans_by_feet = {}
+        
+        for i, low, high, feet in zip(self.patrol_entity, self.patrol_min,
+                                      self.patrol_max, self.patrol_feet):
+            # Move entity
+            velocity = vel_x[i]
+            xi = x[i] + velocity
+            x[i] = xi
             
-            # Outer gold circle
-            pygame.draw.circle(screen, YELLOW, (int(center_x), int(center_y)), coin_radius)
+            # Reverse direction at movement boundaries
+            if xi < low or xi > high:
+                velocity = -velocity
             
-            # Inner orange circle
-            pygame.draw.circle(screen, ORANGE, (int(center_x), int(center_y)), coin_radius - 2)
+            # Check for platform edges
+            spans = spans_by_feet.get(feet)
+            if spans is None:
+                spans = [(platform.x, platform.x + platform.width) for platform in platforms
+                         if platform.y <= feet <= platform.y + 10]
+                spans_by_feet[feet] = spans
+            right = xi + width[i]
+            for left_edge, right_edge in spans:
+                if right > left_edge and xi < right_edge:
+                    break
+            else:
+                # If not on a platform, turn around
+                velocity = -velocity
             
-            # Shine effect
-            shine_x = center_x + math.cos(rotation * math.pi/180) * 3
-            shine_y = center_y + math.sin(rotation * math.pi/180) * 3
-            pygame.draw.circle(screen, (255, 255, 200), (int(shine_x), int(shine_y)), 2)
+            vel_x[i] = velocity
+    
+    def animation_system(self):
+        self.anim_frame = [(frame + step) % period if period else frame + step
+                           for frame, step, period
+                           in zip(self.anim_frame, self.anim_step, self.anim_period)]
+    
+    def draw(self, camera_x):
+        # Each registered kind in turn, culled to the screen
+        for kind, draw_entity in ENTITY_DRAW.items():
+            for i in self.by_kind.get(kind, ()):
+                if -self.width[i] < self.x[i] - camera_x < SCREEN_WIDTH:
+                    draw_entity(self, i)
 
-class Flag:
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
-        self.width = 30
-        self.height = 60
-        self.flag_wave = 0
+def draw_enemy(world, i):
+    x, y = world.x[i], world.y[i]
+    width, height = world.width[i], world.height[i]
     
-    def update(self):
-        self.flag_wave += 0.1
+    # Draw Goomba with simple animation
+    body_color = (120, 70, 0)
+    underside_color = (100, 50, 0)
+    foot_color = (80, 40, 0)
     
-    def draw(self):
-        # Draw flag pole
-        pygame.draw.rect(screen, (220, 220, 220), (self.x, self.y, 5, self.height))
-        pygame.draw.rect(screen, (180, 180, 180), (self.x - 2, self.y, 9, 5))
-        
-        # Draw flag with waving animation
-        wave_offset = math.sin(self.flag_wave) * 3
-        pygame.draw.polygon(screen, RED, [
-            (self.x + 5, self.y + 10),
-            (self.x + 25 + wave_offset, self.y + 15),
-            (self.x + 5, self.y + 30)
-        ])
+    # Body
+    pygame.draw.ellipse(screen, body_color, (x, y, width, height))
+    
+    # Underside
+    pygame.draw.ellipse(screen, underside_color, (x + 5, y + 5, width - 10, height - 10))
+    
+    # Feet with simple animation
+    foot_offset = 0
+    if world.animation_frame(i) < 15:
+        foot_offset = 2
+    
+    pygame.draw.ellipse(screen, foot_color, (x + 5, y + height - 5, 8, 5 + foot_offset))
+    pygame.draw.ellipse(screen, foot_color, (x + width - 13, y + height - 5, 8, 5 + foot_offset))
+    
+    # Eyes
+    eye_offset = 0
+    if world.vel_x[i] < 0:  # Looking left
+        eye_offset = -2
+    else:  # Looking right
+        eye_offset = 2
+        
+    pygame.draw.circle(screen, WHITE, (x + 10, y + 10), 4)
+    pygame.draw.circle(screen, WHITE, (x + width - 10, y + 10), 4)
+    pygame.draw.circle(screen, BLACK, (x + 10 + eye_offset, y + 10), 2)
+    pygame.draw.circle(screen, BLACK, (x + width - 10 + eye_offset, y + 10), 2)
+
+def draw_coin(world, i):
+    frame = world.animation_frame(i)
+    
+    # Bobbing and spinning animation
+    bob_y = world.y[i] + math.sin(frame) * 5
+    rotation = frame * 20
+    
+    # Draw coin with simple rotation effect
+    coin_radius = 8
+    center_x = world.x[i] + world.width[i]/2
+    center_y = bob_y + world.height[i]/2
+    
+    # Outer gold circle
+    pygame.draw.circle(screen, YELLOW, (int(center_x), int(center_y)), coin_radius)
+    
+    # Inner orange circle
+    pygame.draw.circle(screen, ORANGE, (int(center_x), int(center_y)), coin_radius - 2)
+    
+    # Shine effect
+    shine_x = center_x + math.cos(rotation * math.pi/180) * 3
+    shine_y = center_y + math.sin(rotation * math.pi/180) * 3
+    pygame.draw.circle(screen, (255, 255, 200), (int(shine_x), int(shine_y)), 2)
+
+def draw_flag(world, i):
+    x, y = world.x[i], world.y[i]
+    
+    # Draw flag pole
+    pygame.draw.rect(screen, (220, 220, 220), (x, y, 5, world.height[i]))
+    pygame.draw.rect(screen, (180, 180, 180), (x - 2, y, 9, 5))
+    
+    # Draw flag with waving animation
+    wave_offset = math.sin(world.animation_frame(i)) * 3
+    pygame.draw.polygon(screen, RED, [
+        (x + 5, y + 10),
+        (x + 25 + wave_offset, y + 15),
+        (x + 5, y + 30)
+    ])
+
+# Coins, then enemies, then the flag
+ENTITY_DRAW["coin"] = draw_coin
+ENTITY_DRAW["enemy"] = draw_enemy
+ENTITY_DRAW["flag"] = draw_flag
 
 class Game:
     def __init__(self):
         self.player = Player(100, 300)
         self.current_level = 1
         self.platforms = []
-        self.enemies = []
-        self.coins = []
+        self.world = World()
         self.flag = None
         self.game_state = "menu"  # "menu", "playing", "level_complete", "game_over", "game_complete"
         self.level_complete_timer = 0
+        self.level_frames = 0
         self.camera_x = 0
         self.setup_level()
     
     def setup_level(self):
         # Clear previous level
         self.platforms.clear()
-        self.enemies.clear()
-        self.coins.clear()
+        self.world.clear()
         self.flag = None
+        particles.clear()
+        self.level_frames = 0
+        telemetry.level = self.current_level
         
         # Ground platform (longer for scrolling)
         level_width = 2400 if self.current_level == 3 else 1600
@@ -428,13 +977,13 @@ class Game:
             self.platforms.append(Platform(300, 300, 100, 20, GREEN))
             self.platforms.append(Platform(500, 250, 100, 20, GREEN))
             
-            self.enemies.append(Enemy(300, 420, 80))
-            self.enemies.append(Enemy(500, 370, 80))
+            self.world.spawn_enemy(300, 420, 80)
+            self.world.spawn_enemy(500, 370, 80)
             
             for i in range(8):
-                self.coins.append(Coin(250 + i * 80, 200 + (i % 3) * 50))
+                self.world.spawn_coin(250 + i * 80, 200 + (i % 3) * 50)
             
-            self.flag = Flag(900, 200)
+            self.flag = self.world.spawn_flag(900, 200)
         
         elif self.current_level == 2:
             # Level 2 - More challenging
@@ -446,17 +995,17 @@ class Game:
             self.platforms.append(Platform(550, 200, 80, 20, GREEN))
             self.platforms.append(Platform(700, 300, 80, 20, GREEN))
             
-            self.enemies.append(Enemy(200, 420, 100))
-            self.enemies.append(Enemy(350, 370, 100))
-            self.enemies.append(Enemy(500, 320, 100))
-            self.enemies.append(Enemy(650, 270, 100))
+            self.world.spawn_enemy(200, 420, 100)
+            self.world.spawn_enemy(350, 370, 100)
+            self.world.spawn_enemy(500, 320, 100)
+            self.world.spawn_enemy(650, 270, 100)
             
             for i in range(12):
                 x = 200 + (i * 70)
                 y = 150 + (i % 4) * 60
-                self.coins.append(Coin(x, y))
+                self.world.spawn_coin(x, y)
             
-            self.flag = Flag(1200, 150)
+            self.flag = self.world.spawn_flag(1200, 150)
         
         elif self.current_level == 3:
             # Level 3 - Advanced platforming
@@ -472,22 +1021,22 @@ class Game:
             self.platforms.append(Platform(1000, 200, 60, 20, GREEN))
             self.platforms.append(Platform(1100, 150, 60, 20, GREEN))
             
-            self.enemies.append(Enemy(150, 420, 50))
-            self.enemies.append(Enemy(250, 370, 50))
-            self.enemies.append(Enemy(350, 420, 50))
-            self.enemies.append(Enemy(450, 370, 50))
-            self.enemies.append(Enemy(550, 420, 50))
-            self.enemies.append(Enemy(650, 320, 50))
-            self.enemies.append(Enemy(750, 270, 50))
-            self.enemies.append(Enemy(850, 220, 50))
-            self.enemies.append(Enemy(950, 170, 50))
+            self.world.spawn_enemy(150, 420, 50)
+            self.world.spawn_enemy(250, 370, 50)
+            self.world.spawn_enemy(350, 420, 50)
+            self.world.spawn_enemy(450, 370, 50)
+            self.world.spawn_enemy(550, 420, 50)
+            self.world.spawn_enemy(650, 320, 50)
+            self.world.spawn_enemy(750, 270, 50)
+            self.world.spawn_enemy(850, 220, 50)
+            self.world.spawn_enemy(950, 170, 50)
             
             for i in range(20):
                 x = 150 + (i * 60)
                 y = 100 + (i % 5) * 40
-                self.coins.append(Coin(x, y))
+                self.world.spawn_coin(x, y)
             
-            self.flag = Flag(2000, 100)
+            self.flag = self.world.spawn_flag(2000, 100)
     
     def handle_events(self):
         for event in pygame.event.get():
@@ -540,36 +1089,47 @@ class Game:
             self.update_camera()
             
             # Update player
-            result = self.player.update(self.platforms, self.enemies, self.coins, self.flag)
+            result = self.player.update(self.platforms, self.world)
+            self.level_frames += 1
+            if result in ("fall", "hit"):
+                telemetry.record(result, lives=self.player.lives)
             
-            # Update enemies
-            for enemy in self.enemies:
-                enemy.update(self.platforms)
+            # Update enemies, coins and flag
+            self.world.update(self.platforms)
             
-            # Update coins
-            for coin in self.coins:
-                coin.update()
-            
-            # Update flag
-            if self.flag:
-                self.flag.update()
+            # Update particles
+            particles.update()
             
             # Check for level completion
             if result == "level_complete":
                 self.game_state = "level_complete"
                 self.level_complete_timer = 180  # 3 seconds at 60 FPS
+                particles.fireworks(self.world.x[self.flag], self.world.y[self.flag])
+                telemetry.record("level_complete", seconds=round(self.level_frames / FPS, 2),
+                                 score=self.player.score, lives=self.player.lives)
+                telemetry.flush()
             
             # Check for game over
             if self.player.lives <= 0:
                 self.game_state = "game_over"
                 game_over_sound.play()
+                telemetry.record("game_over", score=self.player.score)
+                telemetry.flush()
         
         elif self.game_state == "level_complete":
             self.level_complete_timer -= 1
+            
+            # Launch a firework burst every half second
+            if self.level_complete_timer % 30 == 0:
+                particles.fireworks(random.randint(100, SCREEN_WIDTH - 100),
+                                    random.randint(100, SCREEN_HEIGHT // 2))
+            particles.update()
             if self.level_complete_timer <= 0:
                 self.current_level += 1
                 if self.current_level > 3:
                     self.game_state = "game_complete"
+                    telemetry.record("game_complete", score=self.player.score)
+                    telemetry.flush()
                 else:
                     self.setup_level()
                     self.player.respawn()
@@ -591,22 +1151,14 @@ class Game:
         for platform in self.platforms:
             platform.draw()
         
-        for coin in self.coins:
-            # Only draw coins that are visible
-            if -coin.width < coin.x - self.camera_x < SCREEN_WIDTH:
-                coin.draw()
-        
-        for enemy in self.enemies:
-            # Only draw enemies that are visible
-            if -enemy.width < enemy.x - self.camera_x < SCREEN_WIDTH:
-                enemy.draw()
-        
-        if self.flag and -self.flag.width < self.flag.x - self.camera_x < SCREEN_WIDTH:
-            self.flag.draw()
+        self.world.draw(self.camera_x)
         
         # Draw player
         self.player.draw()
         
+        # Draw particles
+        particles.draw()
+        
         # Draw HUD (always on screen, not affected by camera)
         self.draw_hud()
         
@@ -730,8 +1282,17 @@ class Game:
 
 # Main game loop
 def main():
+    global telemetry
+    init_display()
+    # Started after the first flip so it cannot slow the first frame down
+    loader = threading.Thread(target=load_assets, daemon=True)
+    telemetry = Telemetry(enabled="--no-telemetry" not in sys.argv)
+    
     game = Game()
     running = True
+    first_frame = True
+    show_startup = "--startup-times" in sys.argv
+    sounds_pending = True
     
     while running:
         running = game.handle_events()
@@ -739,10 +1300,32 @@ def main():
         game.draw()
         
         pygame.display.flip()
+        
+        if first_frame:
+            # Recorded before clock.tick() so its sleep is not counted
+            record_stage("first frame", START_TIME)
+            loader.start()
+            init_audio()
+            first_frame = False
+        
         clock.tick(FPS)
+        if game.game_state == "playing":
+            # Raw time excludes the sleep inside clock.tick()
+            telemetry.sample_frame(clock.get_rawtime())
+        
+        # Turn the loader's samples into sounds once it has finished
+        if sounds_pending and not loader.is_alive():
+            build_sounds()
+            sounds_pending = False
+            if show_startup:
+                report_startup()
     
+    telemetry.close()
     pygame.quit()
     sys.exit()
 
 if __name__ == "__main__":
-    main()
+    if "--telemetry-report" in sys.argv:
+        print_telemetry_report()
+    else:
+        main()